@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
-import datetime
 import numpy as np
-from fpdf import FPDF
-from streamlit_gsheets import GSheetsConnection
+from types import MappingProxyType
+import bisect
+from functools import lru_cache
+from collections import namedtuple
 import locale
+import os
+import time
 # Set locale to 'C' or 'en_US' to standardise dot decimal separators
 try:
     locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
@@ -17,8 +20,8 @@ except locale.Error:
 st.set_page_config(page_title="MTB Spring Rate Calculator", page_icon="⚙️", layout="centered")
 
 def reset_form_callback():
-    for key in st.session_state.keys():
-        del st.session_state[key]
+    # Single C-level clear instead of N instrumented __delitem__ calls
+    st.session_state.clear()
 
 if 'category_select' not in st.session_state:
     st.session_state.category_select = "Enduro"
@@ -29,36 +32,81 @@ STONE_TO_KG = 6.35029
 PROGRESSIVE_CORRECTION_FACTOR = 0.97
 EBIKE_WEIGHT_PENALTY_KG = 8.5
 COMMON_STROKES = [45.0, 50.0, 55.0, 57.5, 60.0, 62.5, 65.0, 70.0, 75.0]
+_STROKE_IDX = {s: i for i, s in enumerate(COMMON_STROKES)}  # O(1) default-index lookup
 
 SIZE_WEIGHT_MODS = {"XS": -0.5, "S": -0.25, "M": 0.0, "L": 0.3, "XL": 0.6, "XXL": 0.95}
-
-BIKE_WEIGHT_EST = {
-    "Downcountry": {"Carbon": [12.2, 11.4, 10.4], "Aluminium": [13.8, 13.1, 12.5]},
-    "Trail": {"Carbon": [14.1, 13.4, 12.8], "Aluminium": [15.4, 14.7, 14.0]},
-    "All-Mountain": {"Carbon": [15.0, 14.2, 13.5], "Aluminium": [16.2, 15.5, 14.8]},
-    "Enduro": {"Carbon": [16.2, 15.5, 14.8], "Aluminium": [17.5, 16.6, 15.8]},
-    "Long Travel Enduro": {"Carbon": [16.8, 16.0, 15.2], "Aluminium": [18.0, 17.2, 16.5]},
-    "Downhill (DH)": {"Carbon": [17.8, 17.0, 16.2], "Aluminium": [19.5, 18.5, 17.5]}
+SIZE_KEYS = tuple(SIZE_WEIGHT_MODS)
+
+# Frozen constant tables: MappingProxyType + tuples make the read-only contract
+# explicit and keep accidental per-rerun mutation impossible
+BIKE_WEIGHT_EST = MappingProxyType({
+    "Downcountry": {"Carbon": (12.2, 11.4, 10.4), "Aluminium": (13.8, 13.1, 12.5)},
+    "Trail": {"Carbon": (14.1, 13.4, 12.8), "Aluminium": (15.4, 14.7, 14.0)},
+    "All-Mountain": {"Carbon": (15.0, 14.2, 13.5), "Aluminium": (16.2, 15.5, 14.8)},
+    "Enduro": {"Carbon": (16.2, 15.5, 14.8), "Aluminium": (17.5, 16.6, 15.8)},
+    "Long Travel Enduro": {"Carbon": (16.8, 16.0, 15.2), "Aluminium": (18.0, 17.2, 16.5)},
+    "Downhill (DH)": {"Carbon": (17.8, 17.0, 16.2), "Aluminium": (19.5, 18.5, 17.5)}
+})
+
+_LEVEL_IDX = {"Entry-Level": 0, "Mid-Level": 1, "High-End": 2}
+# Flattened estimate table with the size modifier folded in:
+# (category, material, level index, size) -> base weight in kg
+_BIKE_WEIGHT_FLAT = {
+    (cat, mat, lvl, sz): BIKE_WEIGHT_EST[cat][mat][lvl] + SIZE_WEIGHT_MODS[sz]
+    for cat in BIKE_WEIGHT_EST for mat in BIKE_WEIGHT_EST[cat]
+    for lvl in range(3) for sz in SIZE_WEIGHT_MODS
 }
 
-CATEGORY_DATA = {
-    "Downcountry": {"travel": 115, "stroke": 45.0, "base_sag": 28, "progression": 15, "lr_start": 2.82, "desc": "110–120 mm", "bike_mass_def_kg": 12.0, "bias": 60},
-    "Trail": {"travel": 130, "stroke": 50.0, "base_sag": 30, "progression": 19, "lr_start": 2.90, "desc": "120–140 mm", "bike_mass_def_kg": 13.5, "bias": 63},
-    "All-Mountain": {"travel": 145, "stroke": 55.0, "base_sag": 31, "progression": 21, "lr_start": 2.92, "desc": "140–150 mm", "bike_mass_def_kg": 14.5, "bias": 65},
-    "Enduro": {"travel": 160, "stroke": 60.0, "base_sag": 33, "progression": 23, "lr_start": 3.02, "desc": "150–170 mm", "bike_mass_def_kg": 15.10, "bias": 67},
-    "Long Travel Enduro": {"travel": 175, "stroke": 65.0, "base_sag": 34, "progression": 27, "lr_start": 3.16, "desc": "170–180 mm", "bike_mass_def_kg": 16.5, "bias": 69},
-    "Downhill (DH)": {"travel": 200, "stroke": 72.5, "base_sag": 35, "progression": 28, "lr_start": 3.28, "desc": "180–210 mm", "bike_mass_def_kg": 17.5, "bias": 72}
-}
+# Immutable per-category defaults; attribute access on a namedtuple is a
+# C-level index instead of a second dict hash
+CategoryDef = namedtuple('CategoryDef', 'travel stroke base_sag progression lr_start desc bike_mass_def_kg bias')
+CATEGORY_DATA = MappingProxyType({
+    "Downcountry": CategoryDef(115, 45.0, 28, 15, 2.82, "110–120 mm", 12.0, 60),
+    "Trail": CategoryDef(130, 50.0, 30, 19, 2.90, "120–140 mm", 13.5, 63),
+    "All-Mountain": CategoryDef(145, 55.0, 31, 21, 2.92, "140–150 mm", 14.5, 65),
+    "Enduro": CategoryDef(160, 60.0, 33, 23, 3.02, "150–170 mm", 15.10, 67),
+    "Long Travel Enduro": CategoryDef(175, 65.0, 34, 27, 3.16, "170–180 mm", 16.5, 69),
+    "Downhill (DH)": CategoryDef(200, 72.5, 35, 28, 3.28, "180–210 mm", 17.5, 72)
+})
+
+CAT_KEYS = tuple(CATEGORY_DATA)
+CAT_INDEX = {k: i for i, k in enumerate(CAT_KEYS)}
+# Structure-of-arrays view of the hot numeric fields; the callbacks index
+# these instead of hashing into CATEGORY_DATA twice, and vectorized
+# consumers can operate on whole columns at once
+CAT_BIAS = np.array([v.bias for v in CATEGORY_DATA.values()])
+CAT_BASE_SAG = np.array([v.base_sag for v in CATEGORY_DATA.values()])
+# Travel (mm) upper bounds per category; bisect index maps straight into CAT_KEYS
+_TRAVEL_BRACKETS = (125, 140, 155, 170, 185)
+# Preload turns evaluated in the fine-tuning table, built once
+_PRELOAD_TURNS = np.array([1.0, 1.5, 2.0, 2.5, 3.0])
+# Display labels built once instead of re-running an f-string per rerun
+CAT_LABELS = {k: f"{k} ({v.desc})" for k, v in CATEGORY_DATA.items()}
 
 SKILL_MODIFIERS = {"Just starting": {"bias": +4}, "Beginner": {"bias": +2}, "Intermediate": {"bias": 0}, "Advanced": {"bias": -1}, "Racer": {"bias": -2}}
 SKILL_LEVELS = list(SKILL_MODIFIERS.keys())
+SKILL_INDEX = {s: i for i, s in enumerate(SKILL_LEVELS)}
+SKILL_BIAS = np.array([v["bias"] for v in SKILL_MODIFIERS.values()])
+# Combined category-base + skill-offset bias, one indexed read per (cat, skill)
+BIAS_TABLE = CAT_BIAS[:, None] + SKILL_BIAS[None, :]
 COUPLING_COEFFS = {"Downcountry": 0.80, "Trail": 0.75, "All-Mountain": 0.70, "Enduro": 0.72, "Long Travel Enduro": 0.90, "Downhill (DH)": 0.95}
 
 SPRINDEX_DATA = {
-    "XC/Trail (55mm)": {"max_stroke": 55, "ranges": ["380-430", "430-500", "490-560", "550-610", "610-690", "650-760"]},
-    "Enduro (65mm)": {"max_stroke": 65, "ranges": ["340-380", "390-430", "450-500", "500-550", "540-610", "610-700"]},
-    "DH (75mm)": {"max_stroke": 75, "ranges": ["290-320", "340-370", "400-440", "450-490", "510-570", "570-630"]}
+    "XC/Trail (55mm)": {"max_stroke": 55, "ranges": ("380-430", "430-500", "490-560", "550-610", "610-690", "650-760")},
+    "Enduro (65mm)": {"max_stroke": 65, "ranges": ("340-380", "390-430", "450-500", "500-550", "540-610", "610-700")},
+    "DH (75mm)": {"max_stroke": 75, "ranges": ("290-320", "340-370", "400-440", "450-490", "510-570", "570-630")}
 }
+# Pre-parse the "low-high" labels once so the matching loop never splits strings
+for _entry in SPRINDEX_DATA.values():
+    _entry["parsed"] = tuple(tuple(map(int, _r.split("-"))) for _r in _entry["ranges"])
+SPRINDEX_DATA = MappingProxyType(SPRINDEX_DATA)
+# Columnar view of the parsed bounds, so locating a rate is one searchsorted
+SPRINDEX_ARRAYS = {
+    fam: (np.array([p[0] for p in d["parsed"]]), np.array([p[1] for p in d["parsed"]]))
+    for fam, d in SPRINDEX_DATA.items()
+}
+# Label -> (low, high), for resolving a user-chosen range without re-parsing
+SPRINDEX_BOUNDS = {r: p for d in SPRINDEX_DATA.values() for r, p in zip(d["ranges"], d["parsed"])}
 
 PROGRESSIVE_SPRING_DATA = [
     {"model": "350+", "start": 350, "end": 450, "prog": 28},
@@ -72,57 +120,125 @@ PROGRESSIVE_SPRING_DATA = [
 # ==========================================================
 # 2. HELPER FUNCTIONS
 # ==========================================================
-@st.cache_data
+_DB_CSV = "clean_suspension_database.csv"
+_DB_PARQUET = "clean_suspension_database.parquet"
+# Only the columns the app reads; Parquet loads prune the rest
+_DB_COLUMNS = ['Model', 'Travel_mm', 'Shock_Stroke', 'Start_Leverage', 'End_Leverage', 'Progression_Pct']
+
+@st.cache_resource
 def load_bike_database():
     try:
-        df = pd.read_csv("clean_suspension_database.csv")
+        # Typed, pre-sorted Parquet sidecar skips CSV parsing and the
+        # numeric coercion on cold starts after the first run
+        if os.path.exists(_DB_PARQUET):
+            df = pd.read_parquet(_DB_PARQUET, columns=_DB_COLUMNS)
+            df['Model'] = df['Model'].astype('category')
+            return df
+        df = pd.read_csv(_DB_CSV)
         df.columns = df.columns.str.strip()
-        cols = ['Travel_mm', 'Shock_Stroke', 'Start_Leverage', 'End_Leverage', 'Progression_Pct']
-        for c in cols:
-            if c in df.columns:
-                df[c] = pd.to_numeric(df[c], errors='coerce')
-        return df.sort_values('Model')
+        # One coercion call for all numeric columns instead of five
+        # separate assignments through the BlockManager
+        cols = [c for c in _DB_COLUMNS[1:] if c in df.columns]
+        df[cols] = df[cols].apply(pd.to_numeric, errors='coerce')
+        # float32 is plenty for mm/ratio values and halves the cached frame
+        df[cols] = df[cols].astype('float32')
+        # Categorical Model: integer codes + one string table, shrinking the
+        # cached frame and making equality filters integer compares
+        df['Model'] = df['Model'].astype('category')
+        df = df.sort_values('Model')
+        try:
+            df.to_parquet(_DB_PARQUET)
+        except Exception:
+            pass  # read-only deployments still work straight from the CSV
+        return df
     except FileNotFoundError:
-        st.error("Database file 'clean_suspension_database.csv' not found.")
+        st.error(f"Database file '{_DB_CSV}' not found.")
         return pd.DataFrame()
     except Exception as e:
         st.error(f"Error loading database: {e}")
         return pd.DataFrame()
 
-def analyze_spring_compatibility(progression_pct, has_hbo):
-    analysis = {"Linear": {"status": "", "msg": ""}, "Progressive": {"status": "", "msg": ""}}
+@st.cache_data
+def load_model_options():
+    df = load_bike_database()
+    # Plain strings for the selectbox, straight from the categorical's table
+    return tuple(df['Model'].cat.categories) if not df.empty else ()
+
+@st.cache_data
+def load_model_lookup():
+    # Model -> row dict built once; O(1) lookup instead of a boolean-mask
+    # scan over the whole column on every rerun and callback
+    df = load_bike_database()
+    return df.drop_duplicates('Model').set_index('Model', drop=False).to_dict(orient='index') if not df.empty else {}
+
+@st.cache_data
+def bike_kinematics(model):
+    row = load_model_lookup()[model]
+    return {k: float(row[k]) for k in ('Travel_mm', 'Shock_Stroke', 'Start_Leverage', 'End_Leverage', 'Progression_Pct')}
+
+@lru_cache(maxsize=None)
+def estimate_unsprung(u_tier, u_casing, u_mat, f_size, inserts, is_ebike):
+    wheels = {"Light": 1.7, "Standard": 2.3, "Heavy": 3.0}[u_tier]
+    tyre_mass = {"XC (Lightweight)": 0.7, "Trail (Standard)": 0.95, "Enduro (Reinforced)": 1.25, "DH (Dual-ply)": 1.5}[u_casing]
+    swingarm = (0.4 if u_mat == "Carbon" else 0.7) + SIZE_WEIGHT_MODS[f_size] * 0.15
+    return wheels + tyre_mass + swingarm + (0.5 if inserts else 0.0) + (1.5 if is_ebike else 0.0)
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def compute_spring_rate(sprung_bias_kg, stroke_mm, travel_mm, lr_start, prog_pct, target_sag, adv_kinematics, spring_type):
+    """Pure numeric core of the calculator; cached on its scalar inputs so
+    reruns from unrelated widgets skip the recomputation entirely."""
+    sag_frac = target_sag / 100
+    total_drop = lr_start * (prog_pct / 100)
+    effective_lr = lr_start - (total_drop * sag_frac) if adv_kinematics else travel_mm / stroke_mm
+    rear_load_lbs = max(0, sprung_bias_kg) * KG_TO_LB
+    # 25.4 folds the mm->in conversion (1/MM_TO_IN) into one multiply
+    raw_rate = rear_load_lbs * effective_lr * 25.4 / (stroke_mm * sag_frac) if stroke_mm > 0 else 0
+    if spring_type == "Progressive Spring":
+        raw_rate *= PROGRESSIVE_CORRECTION_FACTOR
+    return effective_lr, rear_load_lbs, raw_rate
+
+# Immutable verdicts so lru_cache can hand the same objects to every caller
+SpringVerdict = namedtuple('SpringVerdict', 'spring_type status msg')
+
+@lru_cache(maxsize=256)
+def analyze_spring_compatibility(progression_tenths, has_hbo):
+    # Keyed on progression quantized to 0.1% (matching the widget step) so
+    # repeated reruns at the same settings are a plain cache hit
+    progression_pct = progression_tenths / 10
     if progression_pct > 25:
-        analysis["Linear"]["status"] = "OK Optimal"; analysis["Linear"]["msg"] = "Matches frame kinematics."
-        analysis["Progressive"]["status"] = "Caution Avoid"; analysis["Progressive"]["msg"] = "Risk of harsh Wall Effect."
+        linear = SpringVerdict("Linear", "OK Optimal", "Matches frame kinematics.")
+        progressive = SpringVerdict("Progressive", "Caution Avoid", "Risk of harsh Wall Effect.")
     elif 12 <= progression_pct <= 25:
-        analysis["Linear"]["status"] = "OK Compatible"; analysis["Linear"]["msg"] = "Use for a plush coil feel."
-        analysis["Progressive"]["status"] = "OK Compatible"; analysis["Progressive"]["msg"] = "Use for more pop and bottom-out resistance."
-        if has_hbo: analysis["Linear"]["msg"] += " (HBO handles bottom-out)."
+        linear_msg = "Use for a plush coil feel."
+        if has_hbo:
+            linear_msg += " (HBO handles bottom-out)."
+        linear = SpringVerdict("Linear", "OK Compatible", linear_msg)
+        progressive = SpringVerdict("Progressive", "OK Compatible", "Use for more pop and bottom-out resistance.")
     else:
-        analysis["Linear"]["status"] = "Caution"; analysis["Linear"]["msg"] = "High risk of bottom-out without strong HBO."
-        analysis["Progressive"]["status"] = "OK Optimal"; analysis["Progressive"]["msg"] = "Essential to compensate for lack of ramp-up."
-    return analysis
+        linear = SpringVerdict("Linear", "Caution", "High risk of bottom-out without strong HBO.")
+        progressive = SpringVerdict("Progressive", "OK Optimal", "Essential to compensate for lack of ramp-up.")
+    return (linear, progressive)
+
+@st.cache_data(show_spinner=False)
+def kinematic_summary(travel_mm, stroke_mm, category, progression):
+    return f"""
+        **Kinematic Summary (Basic Mode):**
+        * System Leverage Ratio: ${travel_mm/stroke_mm:.2f}:1$ (derived from ${travel_mm:.0f}mm \div {stroke_mm:.1f}mm$).
+        * Assumed Progression: ${progression}\%$ (standard for {category} category).
+        """
 
 def update_bias_from_category():
     if 'category_select' in st.session_state:
         cat = st.session_state.category_select
-        st.session_state.rear_bias_slider = CATEGORY_DATA[cat]["bias"]
+        st.session_state.rear_bias_slider = int(CAT_BIAS[CAT_INDEX[cat]])
 
 def update_category_from_bike():
     selected_model = st.session_state.bike_selector
-    bike_db = load_bike_database()
     if selected_model and selected_model != "Bike not listed?":
-        bike_row = bike_db[bike_db['Model'] == selected_model].iloc[0]
-        t = bike_row['Travel_mm']
-        cat_keys = list(CATEGORY_DATA.keys())
-        if t < 125: cat_name = cat_keys[0]
-        elif t < 140: cat_name = cat_keys[1]
-        elif t < 155: cat_name = cat_keys[2]
-        elif t < 170: cat_name = cat_keys[3]
-        elif t < 185: cat_name = cat_keys[4]
-        else: cat_name = cat_keys[5]
-        st.session_state.category_select = cat_name
-        st.session_state.rear_bias_slider = CATEGORY_DATA[cat_name]["bias"]
+        bike_row = load_model_lookup()[selected_model]
+        cat_i = bisect.bisect_right(_TRAVEL_BRACKETS, bike_row['Travel_mm'])
+        st.session_state.category_select = CAT_KEYS[cat_i]
+        st.session_state.rear_bias_slider = int(CAT_BIAS[cat_i])
 
 # ==========================================================
 # 3. UI MAIN
@@ -143,8 +259,15 @@ with st.expander("Settings & Units"):
     with col_u1: unit_mass = st.radio("Mass Units", ["Global (kg)", "North America (lbs)", "UK Hybrid (st & kg)"])
     with col_u2: unit_len = st.radio("Length Units", ["Millimetres (mm)", "Inches (\")"])
 
-u_mass_label = "lbs" if unit_mass == "North America (lbs)" else "kg"
-u_len_label = "in" if unit_len == "Inches (\")" else "mm"
+# Resolve the unit mode once; downstream conversions become bare multiplies
+is_lbs = unit_mass == "North America (lbs)"
+is_inches = unit_len == "Inches (\")"
+u_mass_label = "lbs" if is_lbs else "kg"
+u_len_label = "in" if is_inches else "mm"
+MASS_FACTOR = LB_TO_KG if is_lbs else 1.0      # display -> kg
+LEN_FACTOR = IN_TO_MM if is_inches else 1.0    # display -> mm
+MASS_DISPLAY = KG_TO_LB if is_lbs else 1.0     # kg -> display
+LEN_DISPLAY = MM_TO_IN if is_inches else 1.0   # mm -> display
 
 # --- RIDER PROFILE ---
 st.header("1. Rider Profile")
@@ -155,15 +278,15 @@ with col_r2:
         stone = st.number_input("Rider Weight (st)", 5.0, 20.0, 11.0, 0.5, format="%0.1f")
         lbs_rem = st.number_input("Rider Weight (+lbs)", 0.0, 13.9, 0.0, 1.0, format="%0.1f")
         rider_kg = (stone * STONE_TO_KG) + (lbs_rem * LB_TO_KG)
-    elif unit_mass == "North America (lbs)":
+    elif is_lbs:
         rider_in = st.number_input("Rider Weight (lbs)", 90.0, 280.0, 160.0, 1.0, format="%0.1f")
         rider_kg = rider_in * LB_TO_KG
     else:
         rider_kg = st.number_input("Rider Weight (kg)", 40.0, 130.0, 68.0, 0.5, format="%0.1f")
     
-    gear_def = 5.0 if unit_mass == "North America (lbs)" else 4.0
+    gear_def = 5.0 if is_lbs else 4.0
     gear_input = st.number_input(f"Gear Weight ({u_mass_label})", 0.0, 25.0, float(gear_def), 0.1, format="%0.1f")
-    gear_kg = gear_input * LB_TO_KG if unit_mass == "North America (lbs)" else gear_input
+    gear_kg = gear_input * MASS_FACTOR
 
 # --- CHASSIS DATA ---
 st.header("2. Chassis Data")
@@ -187,14 +310,14 @@ with col_search:
     if not bike_db.empty:
         selected_model = st.selectbox(
             "Select Bike Model", 
-            list(bike_db['Model'].unique()), 
+            load_model_options(),
             index=None, 
             placeholder="Type to search...", 
             key='bike_selector', 
             on_change=update_category_from_bike
         )
         if selected_model:
-            selected_bike_data = bike_db[bike_db['Model'] == selected_model].iloc[0]
+            selected_bike_data = load_model_lookup()[selected_model]
             is_db_bike = True
             bike_model_log = selected_model
     else:
@@ -206,40 +329,44 @@ if manual_entry_mode:
     with col_new1: new_year = st.number_input("Year", 2010, 2026, 2025)
     with col_new2: new_brand = st.text_input("Brand", placeholder="e.g. SANTA CRUZ")
     with col_new3: new_name = st.text_input("Model", placeholder="e.g. NOMAD")
-    bike_model_log = f"{new_year} {new_brand.upper()} {new_name.upper()}".strip()
+    bike_model_log = " ".join(p for p in (str(new_year), new_brand.upper(), new_name.upper()) if p)
 
 category = st.selectbox(
     "Category", 
-    options=list(CATEGORY_DATA.keys()), 
-    format_func=lambda x: f"{x} ({CATEGORY_DATA[x]['desc']})",
+    options=CAT_KEYS,
+    format_func=CAT_LABELS.__getitem__,
     key='category_select', 
     on_change=update_bias_from_category
 )
 defaults = CATEGORY_DATA[category]
+# Bind the hot per-category fields once so reruns do a single dict lookup
+cat_base_sag, cat_prog, cat_lr_start, cat_bias, cat_mass_def = (
+    defaults.base_sag, defaults.progression, defaults.lr_start,
+    defaults.bias, defaults.bike_mass_def_kg
+)
 
 st.divider()
 
 col_inputs, col_summary = st.columns(2)
 
 with col_inputs:
-    size_options = list(SIZE_WEIGHT_MODS.keys())
+    size_options = SIZE_KEYS
     
     if weight_mode == "Estimate":
         f_size = st.selectbox("Size", size_options, index=3, key="shared_f_size") 
         mat = st.selectbox("Frame Material", ["Carbon", "Aluminium"])
         level = st.selectbox("Build Level", ["Entry-Level", "Mid-Level", "High-End"])
 
-        level_map = {"Entry-Level": 0, "Mid-Level": 1, "High-End": 2}
-        base_val = BIKE_WEIGHT_EST[category][mat][level_map[level]]
-        bike_kg = float(base_val + SIZE_WEIGHT_MODS[f_size] + (EBIKE_WEIGHT_PENALTY_KG if is_ebike else 0.0))
+        base_val = _BIKE_WEIGHT_FLAT[(category, mat, _LEVEL_IDX[level], f_size)]
+        bike_kg = float(base_val + (EBIKE_WEIGHT_PENALTY_KG if is_ebike else 0.0))
         bike_weight_source = f"Estimate ({mat}/{level})"
         
-        bike_display_val = bike_kg if unit_mass != "North America (lbs)" else bike_kg * KG_TO_LB
+        bike_display_val = bike_kg * MASS_DISPLAY
         st.info(f"**Estimated Bike Weight:** {bike_display_val:.1f} {u_mass_label}")
     else:
         f_size = st.selectbox("Frame Size", size_options, index=3, key="shared_f_size") 
-        bike_input = st.number_input(f"Bike Weight ({u_mass_label})", 7.0, 45.0, float(defaults["bike_mass_def_kg"]) + (EBIKE_WEIGHT_PENALTY_KG if is_ebike else 0.0), 0.1, format="%0.1f")
-        bike_kg = float(bike_input * LB_TO_KG if unit_mass == "North America (lbs)" else bike_input)
+        bike_input = st.number_input(f"Bike Weight ({u_mass_label})", 7.0, 45.0, float(cat_mass_def) + (EBIKE_WEIGHT_PENALTY_KG if is_ebike else 0.0), 0.1, format="%0.1f")
+        bike_kg = float(bike_input * MASS_FACTOR)
         bike_weight_source = "Manual"
         
     st.markdown("---")
@@ -253,41 +380,36 @@ with col_inputs:
         u_mat = st.selectbox("Rear Triangle Material", ["Carbon", "Aluminium"], index=1)
         inserts = st.checkbox("Tyre Inserts?")
         
-        wheels = {"Light": 1.7, "Standard": 2.3, "Heavy": 3.0}[u_tier]
-        casings = {"XC (Lightweight)": 0.7, "Trail (Standard)": 0.95, "Enduro (Reinforced)": 1.25, "DH (Dual-ply)": 1.5}
-        tyre_mass = casings[u_casing]
-        swingarm_base = 0.4 if u_mat == "Carbon" else 0.7
-        size_factor = SIZE_WEIGHT_MODS[f_size] * 0.15 
-        
-        unsprung_kg = tyre_mass + wheels + (swingarm_base + size_factor) + (0.5 if inserts else 0.0) + (1.5 if is_ebike else 0.0)
+        unsprung_kg = estimate_unsprung(u_tier, u_casing, u_mat, f_size, inserts, is_ebike)
         unsprung_source = f"Estimate ({u_tier}/{u_casing}/{u_mat})"
         
-        u_display_val = unsprung_kg if unit_mass != "North America (lbs)" else unsprung_kg * KG_TO_LB
+        u_display_val = unsprung_kg * MASS_DISPLAY
         st.info(f"**Estimated Unsprung Mass:** {u_display_val:.2f} {u_mass_label}")
     else:
         unsprung_input = st.number_input(f"Unsprung ({u_mass_label})", 0.0, 25.0, 4.27 + (2.0 if is_ebike else 0.0), 0.01, format="%0.2f")
-        unsprung_kg = float(unsprung_input * LB_TO_KG if unit_mass == "North America (lbs)" else unsprung_input)
+        unsprung_kg = float(unsprung_input * MASS_FACTOR)
         unsprung_source = "Manual"
 
 with col_summary:
     st.subheader("Dynamic Mass Distribution")
     if 'rear_bias_slider' not in st.session_state: 
-        st.session_state.rear_bias_slider = defaults["bias"]
+        st.session_state.rear_bias_slider = cat_bias
     
-    st.markdown(f"**Category Base:** {defaults['bias']}%")
-    st.markdown(f"**Skill Recommendation:** {SKILL_MODIFIERS[skill]['bias']:+d}% ({skill})")
+    st.markdown(f"**Category Base:** {cat_bias}%")
+    st.markdown(f"**Skill Recommendation:** {int(SKILL_BIAS[SKILL_INDEX[skill]]):+d}% ({skill})")
     
     final_bias_calc = st.slider("Rear Bias (%)", 55, 80, key="rear_bias_slider")
     
     total_system_kg = rider_kg + gear_kg + bike_kg
     sprung_mass_kg = total_system_kg - unsprung_kg
-    rear_val_kg = (sprung_mass_kg * (final_bias_calc/100)) + (unsprung_kg if final_bias_calc > 0 else 0)
+    sprung_bias_kg = sprung_mass_kg * (final_bias_calc / 100)
+    rear_val_kg = sprung_bias_kg + (unsprung_kg if final_bias_calc > 0 else 0)
     front_val = total_system_kg - rear_val_kg
     
     st.write("---")
-    total_display = total_system_kg if unit_mass != "North America (lbs)" else total_system_kg * KG_TO_LB
-    front_display = front_val if unit_mass != "North America (lbs)" else front_val * KG_TO_LB
-    rear_display = rear_val_kg if unit_mass != "North America (lbs)" else rear_val_kg * KG_TO_LB
+    total_display = total_system_kg * MASS_DISPLAY
+    front_display = front_val * MASS_DISPLAY
+    rear_display = rear_val_kg * MASS_DISPLAY
     
     st.metric("Total System Mass", f"{total_display:.1f} {u_mass_label}")
     st.progress(final_bias_calc / 100)
@@ -301,22 +423,23 @@ st.header("3. Shock & Kinematics")
 col_k1, col_k2 = st.columns(2)
 
 if is_db_bike:
-    raw_travel, raw_stroke, raw_prog, raw_lr_start = float(selected_bike_data['Travel_mm']), float(selected_bike_data['Shock_Stroke']), float(selected_bike_data['Progression_Pct']), float(selected_bike_data['Start_Leverage'])
+    bike_kin = bike_kinematics(selected_model)
+    raw_travel, raw_stroke, raw_prog, raw_lr_start = bike_kin['Travel_mm'], bike_kin['Shock_Stroke'], bike_kin['Progression_Pct'], bike_kin['Start_Leverage']
 else:
-    raw_travel, raw_stroke, raw_prog, raw_lr_start = 165.0, 62.5, float(defaults["progression"]), float(defaults["lr_start"])
+    raw_travel, raw_stroke, raw_prog, raw_lr_start = 165.0, 62.5, float(cat_prog), float(cat_lr_start)
 
 with col_k1:
     # Cast to integer and set format to %d to remove decimals and avoid type mismatch warnings
-    travel_val = int(raw_travel if unit_len == "Millimetres (mm)" else raw_travel * MM_TO_IN)
+    travel_val = int(raw_travel * LEN_DISPLAY)
     travel_in = st.number_input(f"Rear Travel ({u_len_label})", 0, 300, travel_val, 1, format="%d")
     
-    if unit_len == "Inches (\")":
+    if is_inches:
         stroke_in = st.number_input(f"Shock Stroke ({u_len_label})", 1.5, 5.0, float(raw_stroke * MM_TO_IN), 0.1, disabled=is_db_bike, format="%0.2f")
         stroke_mm = stroke_in * IN_TO_MM
     else:
-        stroke_mm = st.selectbox(f"Shock Stroke ({u_len_label})", COMMON_STROKES, index=COMMON_STROKES.index(62.5), disabled=is_db_bike)
+        stroke_mm = st.selectbox(f"Shock Stroke ({u_len_label})", COMMON_STROKES, index=_STROKE_IDX.get(raw_stroke, 5), disabled=is_db_bike)
     
-    travel_mm = travel_in * IN_TO_MM if unit_len == "Inches (\")" else float(travel_in)
+    travel_mm = travel_in * LEN_FACTOR
 
 calc_lr_start = travel_mm / stroke_mm if stroke_mm > 0 else 0
 
@@ -325,233 +448,278 @@ with col_k2:
     
     if not adv_kinematics:
         st.container()
-        st.markdown(f"""
-        **Kinematic Summary (Basic Mode):**
-        * System Leverage Ratio: ${travel_mm/stroke_mm:.2f}:1$ (derived from ${travel_mm:.0f}mm \div {stroke_mm:.1f}mm$).
-        * Assumed Progression: ${defaults['progression']}\%$ (standard for {category} category).
-        """)
-        prog_pct = float(defaults["progression"])
+        st.markdown(kinematic_summary(travel_mm, stroke_mm, category, cat_prog))
+        prog_pct = float(cat_prog)
     else:
         lr_start = st.number_input("LR Start Rate", 1.5, 4.0, float(raw_lr_start), 0.05, format="%0.2f")
         prog_pct = st.number_input("Progression (%)", -10.0, 60.0, float(raw_prog), 0.1, format="%0.1f")
         calc_lr_start = lr_start
 
-# --- SPRING SELECTION ---
-st.header("4. Spring Compatibility & Selection")
-target_sag = st.slider("Target Sag (%)", 20.0, 40.0, float(defaults["base_sag"]), 0.5)
-
-with st.container():
-    col_comp, col_sel = st.columns([0.6, 0.4])
-    with col_comp:
-        st.subheader("Analysis")
-        has_hbo = st.checkbox("Shock has HBO?")
-        analysis = analyze_spring_compatibility(progression_pct=prog_pct, has_hbo=has_hbo)
-        for s_type, info in analysis.items():
-            st.markdown(f"**{info['status']} {s_type}**: {info['msg']}")
-    with col_sel:
-        st.subheader("Selection")
-        spring_list = ["Standard Steel (Linear)", "Lightweight Steel/Ti (linear)", "Sprindex (20% end progression)", "Progressive Spring"]
-        spring_type_sel = st.selectbox("Select Spring Type", spring_list)
+# --- SPRING SELECTION & RESULTS (fragment) ---
+# Isolated as a fragment so tweaking the sag slider, spring type or HBO
+# toggle only reruns this block instead of the whole script (DB load,
+# weight sections and kinematics widgets above stay untouched).
+@st.fragment
+def render_spring_and_results(sprung_bias_kg, sprung_mass_kg, unsprung_kg, rider_kg, gear_kg,
+                              stroke_mm, travel_mm, calc_lr_start, prog_pct, adv_kinematics,
+                              category, cat_base_sag, bike_model_log, u_len_label):
+    # --- SPRING SELECTION ---
+    st.header("4. Spring Compatibility & Selection")
+    target_sag = st.slider("Target Sag (%)", 20.0, 40.0, float(cat_base_sag), 0.5)
+
+    with st.container():
+        col_comp, col_sel = st.columns([0.6, 0.4])
+        with col_comp:
+            st.subheader("Analysis")
+            has_hbo = st.checkbox("Shock has HBO?")
+            analysis = analyze_spring_compatibility(int(round(prog_pct * 10)), has_hbo)
+            # One markdown element (one frontend message) instead of one per spring type
+            st.markdown("\n\n".join(
+                f"**{v.status} {v.spring_type}**: {v.msg}" for v in analysis
+            ))
+        with col_sel:
+            st.subheader("Selection")
+            spring_list = ["Standard Steel (Linear)", "Lightweight Steel/Ti (linear)", "Sprindex (20% end progression)", "Progressive Spring"]
+            spring_type_sel = st.selectbox("Select Spring Type", spring_list)
+
+    # Results stay hidden until the first explicit Calculate, so half-filled
+    # inputs don't trigger the table/PDF machinery on every keystroke
+    if st.button("Calculate", type="primary", use_container_width=True):
+        st.session_state["_show_results"] = True
+
+    # ==========================================================
+    # 4. CALCULATIONS
+    # ==========================================================
+    # Abort the rerun before any table/PDF work when the geometry is unusable
+    if stroke_mm <= 0 or travel_mm <= 0:
+        st.error("Ensure Shock Stroke and Rear Travel are greater than zero.")
+        st.stop()
+
+    sag_frac = target_sag / 100
+    eff_rider_kg = rider_kg + (gear_kg * COUPLING_COEFFS[category])
+    effective_lr, rear_load_lbs, raw_rate = compute_spring_rate(
+        sprung_bias_kg, stroke_mm, travel_mm, calc_lr_start, prog_pct,
+        target_sag, adv_kinematics, spring_type_sel
+    )
+    # Hand the fragment-local numbers back to the full script (logging section)
+    st.session_state["_last_results"] = {"target_sag": target_sag, "raw_rate": raw_rate}
+    # sag% for a spring of rate r is sag_numer / r; 2540 = 25.4 (mm->in) * 100 (%)
+    sag_numer = rear_load_lbs * effective_lr * 2540.0 / stroke_mm if stroke_mm > 0 else 0
+
+    # ==========================================================
+    # 5. RESULTS
+    # ==========================================================
+    st.divider()
+    st.header("Results")
+
+    if raw_rate > 0 and st.session_state.get("_show_results"):
+        res_c1, res_c2 = st.columns(2)
+        res_c1.metric("Calculated spring rate", f"{int(raw_rate)} lbs/in")
+        sag_val = stroke_mm * sag_frac
+        sag_display = sag_val * LEN_DISPLAY
+        res_c2.metric("Target Sag", f"{target_sag:.1f}% ({sag_display:.2f} {u_len_label})")
+
+        current_rate = int(round(raw_rate / 25) * 25)
+        active_range = ""
 
-# ==========================================================
-# 4. CALCULATIONS
-# ==========================================================
-total_drop = calc_lr_start * (prog_pct / 100)
-effective_lr = calc_lr_start - (total_drop * (target_sag / 100)) if adv_kinematics else travel_mm / stroke_mm
-eff_rider_kg = rider_kg + (gear_kg * COUPLING_COEFFS[category])
-
-rear_load_lbs = max(0, (sprung_mass_kg * (final_bias_calc / 100))) * KG_TO_LB
-raw_rate = (rear_load_lbs * effective_lr) / (stroke_mm * (target_sag / 100) * MM_TO_IN) if stroke_mm > 0 else 0
-if spring_type_sel == "Progressive Spring": raw_rate *= PROGRESSIVE_CORRECTION_FACTOR
-
-# ==========================================================
-# 5. RESULTS
-# ==========================================================
-st.divider()
-st.header("Results")
-
-if raw_rate > 0:
-    res_c1, res_c2 = st.columns(2)
-    res_c1.metric("Calculated spring rate", f"{int(raw_rate)} lbs/in")
-    sag_val = stroke_mm * (target_sag / 100)
-    sag_display = sag_val if unit_len == "Millimetres (mm)" else sag_val * MM_TO_IN
-    res_c2.metric("Target Sag", f"{target_sag:.1f}% ({sag_display:.2f} {u_len_label})")
-
-    current_rate = int(round(raw_rate / 25) * 25)
-    active_range = ""
-
-    if "Sprindex" in spring_type_sel:
-        family = "XC/Trail (55mm)" if stroke_mm <= 55 else "Enduro (65mm)" if stroke_mm <= 65 else "DH (75mm)"
-        ranges = SPRINDEX_DATA[family]["ranges"]
-        found_match, gap_neighbors = False, []
+        if "Sprindex" in spring_type_sel:
+            family = "XC/Trail (55mm)" if stroke_mm <= 55 else "Enduro (65mm)" if stroke_mm <= 65 else "DH (75mm)"
+            ranges = SPRINDEX_DATA[family]["ranges"]
+            lows, highs = SPRINDEX_ARRAYS[family]
+            found_match, gap_neighbors = False, []
         
-        for i, r_str in enumerate(ranges):
-            low, high = map(int, r_str.split("-"))
-            if low <= raw_rate <= high:
-                active_range, found_match = r_str, True
+            idx = int(np.searchsorted(lows, raw_rate, side='right')) - 1
+            match_i = -1
+            if idx > 0 and raw_rate <= highs[idx - 1]:
+                match_i = idx - 1  # adjacent ranges overlap: keep the earlier one
+            elif idx >= 0 and raw_rate <= highs[idx]:
+                match_i = idx
+            if match_i >= 0:
+                active_range, found_match = ranges[match_i], True
                 st.success(f"**Recommended Sprindex:** {family} | {active_range} lbs/in")
-                break
-            if i > 0:
-                prev_high = int(ranges[i-1].split("-")[1])
-                if prev_high < raw_rate < low:
-                    gap_neighbors = [ranges[i-1], r_str]
-
-        if not found_match and gap_neighbors:
-            st.warning(f"Calculated rate ({int(raw_rate)} lbs) falls between hardware ranges.")
-            active_range = st.radio("Select hardware preference:", gap_neighbors)
+            elif 0 <= idx < len(ranges) - 1:
+                gap_neighbors = [ranges[idx], ranges[idx + 1]]
+
+            if not found_match and gap_neighbors:
+                st.warning(f"Calculated rate ({int(raw_rate)} lbs) falls between hardware ranges.")
+                active_range = st.radio("Select hardware preference:", gap_neighbors)
         
-        low_bound, high_bound = map(int, active_range.split("-"))
-        step = 5 if "DH" not in family else 10
-        st.subheader(f"Sprindex Range Mapping ({active_range} lbs)")
-        range_data = []
-        for r in range(low_bound, high_bound + step, step):
-            r_sag_pct = ((rear_load_lbs * effective_lr / r) / (stroke_mm * MM_TO_IN)) * 100
-            diff = r_sag_pct - target_sag
-            status = "Target" if abs(diff) < 0.5 else "Supportive" if diff < 0 else "Plush"
-            range_data.append({"Dial Index (lbs)": f"{r} lbs", "Resulting Sag": f"{r_sag_pct:.1f}%", "Character": status})
-        st.table(pd.DataFrame(range_data))
-        current_rate = high_bound
-
-    elif "Progressive Spring" in spring_type_sel:
-        st.subheader("Progressive Spring Recommendation")
-        st.info("Progressive springs are rated by their initial (start) rate. Final sag is determined by the initial rate.")
+            low_bound, high_bound = SPRINDEX_BOUNDS[active_range]
+            step = 5 if "DH" not in family else 10
+            st.subheader(f"Sprindex Range Mapping ({active_range} lbs)")
+            range_data = []
+            for r in range(low_bound, high_bound + step, step):
+                r_sag_pct = sag_numer / r
+                diff = r_sag_pct - target_sag
+                status = "Target" if abs(diff) < 0.5 else "Supportive" if diff < 0 else "Plush"
+                range_data.append({"Dial Index (lbs)": f"{r} lbs", "Resulting Sag": f"{r_sag_pct:.1f}%", "Character": status})
+            st.table(pd.DataFrame(range_data))
+            current_rate = high_bound
+
+        elif "Progressive Spring" in spring_type_sel:
+            st.subheader("Progressive Spring Recommendation")
+            st.info("Progressive springs are rated by their initial (start) rate. Final sag is determined by the initial rate.")
         
-        closest_prog = min(PROGRESSIVE_SPRING_DATA, key=lambda x: abs(x["start"] - raw_rate))
+            closest_prog = min(PROGRESSIVE_SPRING_DATA, key=lambda x: abs(x["start"] - raw_rate))
         
-        prog_table = []
-        for p_model in PROGRESSIVE_SPRING_DATA:
-            p_sag_pct = ((rear_load_lbs * effective_lr / p_model["start"]) / (stroke_mm * MM_TO_IN)) * 100
-            diff = p_sag_pct - target_sag
-            status = "Target Match" if p_model == closest_prog else "Alternative"
-            feel = "Plush" if p_model["start"] < closest_prog["start"] else "Firm" if p_model["start"] > closest_prog["start"] else "Balanced"
+            prog_table = []
+            for p_model in PROGRESSIVE_SPRING_DATA:
+                p_sag_pct = sag_numer / p_model["start"]
+                diff = p_sag_pct - target_sag
+                status = "Target Match" if p_model == closest_prog else "Alternative"
+                feel = "Plush" if p_model["start"] < closest_prog["start"] else "Firm" if p_model["start"] > closest_prog["start"] else "Balanced"
             
-            prog_table.append({
-                "Model": p_model["model"],
-                "Start Rate": f"{p_model['start']} lbs",
-                "End Rate": f"{p_model['end']} lbs",
-                "Ramp (%)": f"+{p_model['prog']}%",
-                "Resulting Sag": f"{p_sag_pct:.1f}%",
-                "Character": feel if status == "Alternative" else "Target"
-            })
+                prog_table.append({
+                    "Model": p_model["model"],
+                    "Start Rate": f"{p_model['start']} lbs",
+                    "End Rate": f"{p_model['end']} lbs",
+                    "Ramp (%)": f"+{p_model['prog']}%",
+                    "Resulting Sag": f"{p_sag_pct:.1f}%",
+                    "Character": feel if status == "Alternative" else "Target"
+                })
         
-        st.table(pd.DataFrame(prog_table))
-        st.warning("Warning: Progressive springs increase end-stroke support but may require less damping (HSC) to avoid harshness.")
-        current_rate = closest_prog["start"]
+            st.table(pd.DataFrame(prog_table))
+            st.warning("Warning: Progressive springs increase end-stroke support but may require less damping (HSC) to avoid harshness.")
+            current_rate = closest_prog["start"]
 
-    else:
-        standard_spring_strokes = [55, 60, 65, 75]
-        required_stroke_mm = next((s for s in standard_spring_strokes if s >= stroke_mm), 75)
-        spring_size_display = required_stroke_mm if unit_len == "Millimetres (mm)" else required_stroke_mm * MM_TO_IN
-        st.markdown(f"**Required Spring Size:** {spring_size_display:.2f} {u_len_label} Stroke")
-        center_rate = int(round(raw_rate / 25) * 25)
-        current_rate = center_rate
-        alt_rates = []
-        for r in [center_rate - 50, center_rate - 25, center_rate, center_rate + 25, center_rate + 50]:
-            if r <= 0: continue
-            r_sag_pct = ((rear_load_lbs * effective_lr / r) / (stroke_mm * MM_TO_IN)) * 100
-            alt_rates.append({"Rate (lbs)": f"{r} lbs", "Resulting Sag": f"{r_sag_pct:.1f}%", "Feel": "Plush" if r < center_rate else "Supportive" if r > center_rate else "Target"})
-        st.table(alt_rates)
-
-    st.subheader(f"Fine Tuning (Preload - {current_rate} lbs spring)")
-    preload_results = []
-    for turns in [1.0, 1.5, 2.0, 2.5, 3.0]:
-        sag_val_calc = (rear_load_lbs * effective_lr / current_rate) - (turns * 1.0 * MM_TO_IN)
-        sag_pct = (sag_val_calc / (stroke_mm * MM_TO_IN)) * 100
-        preload_results.append({"Turns": turns, "Sag (%)": f"{max(0, sag_pct):.1f}%", "Status": "OK" if 1.0 <= turns <= 2.0 else "Caution"})
-    st.dataframe(pd.DataFrame(preload_results), hide_index=True)
-    
-    def generate_pdf():
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", 'B', 16)
-        pdf.cell(200, 10, "MTB Spring Rate Calculation Report", ln=True, align='C')
-        pdf.set_font("Arial", size=11); pdf.ln(10)
-        
-        pdf.set_font("Arial", 'B', 12); pdf.cell(200, 10, "1. Calculation Summary", ln=True)
-        pdf.set_font("Arial", size=10)
-        pdf.cell(200, 8, f"Bike: {bike_model_log}", ln=True)
-        pdf.cell(200, 8, f"Sprung Mass: {sprung_mass_kg:.1f} kg | Unsprung: {unsprung_kg:.1f} kg", ln=True)
-        pdf.cell(200, 8, f"Calculated Rear Load: {rear_load_lbs:.1f} lbs", ln=True)
-        pdf.cell(200, 8, f"Mathematical Baseline: {int(raw_rate)} lbs/in", ln=True)
-        
-        pdf.ln(5); pdf.set_font("Arial", 'B', 12); pdf.cell(200, 10, "2. Setup Guide", ln=True)
-        pdf.set_font("Arial", size=10); pdf.cell(200, 8, f"Spring Type: {spring_type_sel}", ln=True)
-        
-        if "Sprindex" in spring_type_sel:
-            pdf_family = "XC/Trail (55mm)" if stroke_mm <= 55 else "Enduro (65mm)" if stroke_mm <= 65 else "DH (75mm)"
-            pdf.cell(200, 8, f"Hardware Family: {pdf_family}", ln=True)
-            pdf.cell(200, 8, f"Recommended Range: {active_range} lbs", ln=True)
-        elif "Progressive Spring" in spring_type_sel:
-            pdf.cell(200, 8, f"Recommended Model: {closest_prog['model']}", ln=True)
-            pdf.cell(200, 8, f"Ramp-up: +{closest_prog['prog']}%", ln=True)
         else:
-            pdf_size = next((s for s in [55, 60, 65, 75] if s >= stroke_mm), 75)
-            pdf_size_display = pdf_size if unit_len == "Millimetres (mm)" else pdf_size * MM_TO_IN
-            pdf.cell(200, 8, f"Required Size: {pdf_size_display:.2f} {u_len_label} Stroke", ln=True)
-        
-        pdf.ln(5); pdf.set_font("Arial", 'B', 12); pdf.cell(200, 10, "3. Rate Mapping / Options", ln=True)
-        
-        try:
+            standard_spring_strokes = [55, 60, 65, 75]
+            required_stroke_mm = next((s for s in standard_spring_strokes if s >= stroke_mm), 75)
+            spring_size_display = required_stroke_mm * LEN_DISPLAY
+            st.markdown(f"**Required Spring Size:** {spring_size_display:.2f} {u_len_label} Stroke")
+            center_rate = int(round(raw_rate / 25) * 25)
+            current_rate = center_rate
+            # Same vectorized shape as the preload table below: one array op, one pass
+            rate_arr = center_rate + np.array([-50, -25, 0, 25, 50])
+            rate_arr = rate_arr[rate_arr > 0]
+            alt_sag_arr = sag_numer / rate_arr
+            feel_arr = np.where(rate_arr < center_rate, "Plush", np.where(rate_arr > center_rate, "Supportive", "Target"))
+            alt_rates = [
+                {"Rate (lbs)": f"{r} lbs", "Resulting Sag": f"{p:.1f}%", "Feel": f}
+                for r, p, f in zip(rate_arr.tolist(), alt_sag_arr.tolist(), feel_arr.tolist())
+            ]
+            st.table(alt_rates)
+
+        st.subheader(f"Fine Tuning (Preload - {current_rate} lbs spring)")
+        turns_arr = _PRELOAD_TURNS
+        # Same fused form: turns preload in mm scaled straight to sag %
+        sag_pct_arr = sag_numer / current_rate - turns_arr * (100.0 / stroke_mm)
+        status_arr = np.where((turns_arr >= 1.0) & (turns_arr <= 2.0), "OK", "Caution")
+        # Columnar construction: one array per column, formatting done in C
+        st.table(pd.DataFrame({
+            "Turns": turns_arr,
+            "Sag (%)": np.char.mod("%.1f%%", np.maximum(sag_pct_arr, 0.0)),
+            "Status": status_arr,
+        }))
+    
+        def generate_pdf():
+            # Deferred import: fpdf is only needed when a report is actually built
+            from fpdf import FPDF
+            pdf = FPDF()
+            pdf.add_page()
+            pdf.set_font("Arial", 'B', 16)
+            pdf.cell(200, 10, "MTB Spring Rate Calculation Report", ln=True, align='C')
+            pdf.ln(10)
+
+            def section(title, lines):
+                # One font switch per style block instead of toggling around every cell
+                pdf.set_font("Arial", 'B', 12); pdf.cell(200, 10, title, ln=True)
+                pdf.set_font("Arial", size=10)
+                for text in lines:
+                    pdf.cell(200, 8, text, ln=True)
+
+            section("1. Calculation Summary", (
+                # Core fonts are latin-1 only; user-typed model names may not be
+                f"Bike: {bike_model_log.encode('ascii', 'replace').decode()}",
+                f"Sprung Mass: {sprung_mass_kg:.1f} kg | Unsprung: {unsprung_kg:.1f} kg",
+                f"Calculated Rear Load: {rear_load_lbs:.1f} lbs",
+                f"Mathematical Baseline: {int(raw_rate)} lbs/in",
+            ))
+
+            pdf.ln(5)
+            setup_lines = [f"Spring Type: {spring_type_sel}"]
             if "Sprindex" in spring_type_sel:
-                target_list, rate_key, char_key = range_data, "Dial Index (lbs)", "Character"
+                pdf_family = "XC/Trail (55mm)" if stroke_mm <= 55 else "Enduro (65mm)" if stroke_mm <= 65 else "DH (75mm)"
+                setup_lines += [f"Hardware Family: {pdf_family}", f"Recommended Range: {active_range} lbs"]
             elif "Progressive Spring" in spring_type_sel:
-                target_list, rate_key, char_key = prog_table, "Model", "Character"
+                setup_lines += [f"Recommended Model: {closest_prog['model']}", f"Ramp-up: +{closest_prog['prog']}%"]
             else:
-                target_list, rate_key, char_key = alt_rates, "Rate (lbs)", "Feel"
-
-            for r_row in target_list:
-                r_rate = r_row[rate_key]
-                r_sag = r_row["Resulting Sag"]
-                r_char = r_row[char_key]
-                pdf.cell(200, 8, f"{r_rate}: {r_sag} ({r_char})", ln=True)
-        except Exception:
-            pdf.cell(200, 8, "Mapping data unavailable for this selection.", ln=True)
-        
-        pdf.ln(10); pdf.set_font("Arial", 'I', 9)
-        pdf.multi_cell(0, 5, "Engineering Disclaimer: Actual requirements may deviate due to damper valving, friction, and dynamic riding loads. Physical verification via sag measurement is mandatory.")
-        return pdf.output(dest="S").encode("latin-1")
+                pdf_size = next((s for s in [55, 60, 65, 75] if s >= stroke_mm), 75)
+                pdf_size_display = pdf_size * LEN_DISPLAY
+                setup_lines.append(f"Required Size: {pdf_size_display:.2f} {u_len_label} Stroke")
+            section("2. Setup Guide", setup_lines)
+
+            pdf.ln(5)
+            try:
+                if "Sprindex" in spring_type_sel:
+                    target_list, rate_key, char_key = range_data, "Dial Index (lbs)", "Character"
+                elif "Progressive Spring" in spring_type_sel:
+                    target_list, rate_key, char_key = prog_table, "Model", "Character"
+                else:
+                    target_list, rate_key, char_key = alt_rates, "Rate (lbs)", "Feel"
+                map_lines = [
+                    f"{r_row[rate_key]}: {r_row['Resulting Sag']} ({r_row[char_key]})"
+                    for r_row in target_list
+                ]
+            except Exception:
+                map_lines = ["Mapping data unavailable for this selection."]
+            section("3. Rate Mapping / Options", map_lines)
+
+            pdf.ln(10); pdf.set_font("Arial", 'I', 9)
+            pdf.multi_cell(0, 5, "Engineering Disclaimer: Actual requirements may deviate due to damper valving, friction, and dynamic riding loads. Physical verification via sag measurement is mandatory.")
+            # fpdf2 returns a bytearray built with O(1) appends (legacy fpdf
+            # grew a str and needed the latin-1 round-trip)
+            return bytes(pdf.output())
     
-    try:
-        pdf_bytes = generate_pdf()
-        st.download_button(
-            label="Export Results to PDF", 
-            data=pdf_bytes, 
-            file_name=f"MTB_Spring_Report_{datetime.datetime.now().strftime('%Y%m%d')}.pdf", 
-            mime="application/pdf"
-        )
-    except Exception as e:
-        st.error(f"PDF Generation Error: {e}")
-        
+        try:
+            pdf_bytes = generate_pdf()
+            st.download_button(
+                label="Export Results to PDF", 
+                data=pdf_bytes, 
+                file_name=f"MTB_Spring_Report_{time.strftime('%Y%m%d')}.pdf", 
+                mime="application/pdf"
+            )
+        except Exception as e:
+            st.error(f"PDF Generation Error: {e}")
+
+
+render_spring_and_results(sprung_bias_kg, sprung_mass_kg, unsprung_kg, rider_kg, gear_kg,
+                          stroke_mm, travel_mm, calc_lr_start, prog_pct, adv_kinematics,
+                          category, cat_base_sag, bike_model_log, u_len_label)
+
 # --- LOGGING ---
 st.divider(); st.subheader("Configuration Log")
 st.info("Help us improve: By logging your setup, you contribute kinematic data to our global database.")
-flat_log = {
-    "Timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    "Chassis": chassis_type,
-    "Bike_Model": bike_model_log,
-    "Frame_Size": f_size,
-    "Rider_Weight_Kg": round(rider_kg, 1),
-    "Bike_Weight_Kg": round(bike_kg, 1),
-    "Sprung_Mass_Kg": round(total_system_kg - unsprung_kg, 1),
-    "Unsprung_Mass_Kg": round(unsprung_kg, 1),
-    "Target_Sag_Pct": target_sag,
-    "Calculated_Spring_Rate": int(raw_rate),
-    "Kinematics_Source": "Verified DB" if selected_bike_data is not None else "User Contributed",
-    "Bike_Weight_Source": bike_weight_source,
-    "Unsprung_Mass_Source": unsprung_source,
-    "Bias_Setting": f"{final_bias_calc}%",
-    "Travel_mm": round(travel_mm, 1),
-    "Stroke_mm": round(stroke_mm, 1),
-    "Start_LR_Log": round(calc_lr_start, 2),
-    "Progression_Log": round(prog_pct, 1),
-    "Submission_Type": "Verified" if is_db_bike else "User_Contributed"
-}
 
 try:
+    from streamlit_gsheets import GSheetsConnection
     conn = st.connection("gsheets", type=GSheetsConnection)
     if st.button("Save to Google Sheets", type="primary"):
+        _last = st.session_state.get("_last_results", {"target_sag": float(cat_base_sag), "raw_rate": 0.0})
+        # The payload is only assembled (and the timestamp taken) on save
+        flat_log = {
+            "Timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "Chassis": chassis_type,
+            "Bike_Model": bike_model_log,
+            "Frame_Size": f_size,
+            "Rider_Weight_Kg": round(rider_kg, 1),
+            "Bike_Weight_Kg": round(bike_kg, 1),
+            "Sprung_Mass_Kg": round(total_system_kg - unsprung_kg, 1),
+            "Unsprung_Mass_Kg": round(unsprung_kg, 1),
+            "Target_Sag_Pct": _last["target_sag"],
+            "Calculated_Spring_Rate": int(_last["raw_rate"]),
+            "Kinematics_Source": "Verified DB" if selected_bike_data is not None else "User Contributed",
+            "Bike_Weight_Source": bike_weight_source,
+            "Unsprung_Mass_Source": unsprung_source,
+            "Bias_Setting": f"{final_bias_calc}%",
+            "Travel_mm": round(travel_mm, 1),
+            "Stroke_mm": round(stroke_mm, 1),
+            "Start_LR_Log": round(calc_lr_start, 2),
+            "Progression_Log": round(prog_pct, 1),
+            "Submission_Type": "Verified" if is_db_bike else "User_Contributed"
+        }
         existing_data = conn.read(worksheet="Sheet1", ttl=5)
-        conn.update(worksheet="Sheet1", data=pd.concat([existing_data, pd.DataFrame([flat_log])], ignore_index=True))
+        conn.update(worksheet="Sheet1", data=pd.concat([existing_data, pd.DataFrame.from_records([flat_log])], ignore_index=True))
         st.success("Setup successfully logged!")
 except Exception as e: st.error(f"Cloud Connection Inactive: {e}.")
 
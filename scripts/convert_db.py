@@ -0,0 +1,33 @@
+"""One-shot converter: clean_suspension_database.csv -> .parquet.
+
+The app writes this sidecar itself on first run when it can, but
+read-only deployments (e.g. Streamlit Cloud) can't persist it. Run this
+script once before deploying so cold starts skip CSV parsing and the
+numeric coercion entirely:
+
+    python scripts/convert_db.py
+"""
+import os
+import sys
+
+import pandas as pd
+
+_DB_CSV = "clean_suspension_database.csv"
+_DB_PARQUET = "clean_suspension_database.parquet"
+_NUMERIC_COLS = ['Travel_mm', 'Shock_Stroke', 'Start_Leverage', 'End_Leverage', 'Progression_Pct']
+
+
+def convert(csv_path=_DB_CSV, parquet_path=_DB_PARQUET):
+    df = pd.read_csv(csv_path)
+    df.columns = df.columns.str.strip()
+    cols = [c for c in _NUMERIC_COLS if c in df.columns]
+    df[cols] = df[cols].apply(pd.to_numeric, errors='coerce')
+    df[cols] = df[cols].astype('float32')
+    # Pre-sort so the app never sorts at load time
+    df = df.sort_values('Model')
+    df.to_parquet(parquet_path)
+    print(f"Wrote {parquet_path} ({os.path.getsize(parquet_path)} bytes, {len(df)} rows)")
+
+
+if __name__ == "__main__":
+    convert(*sys.argv[1:3])